@@ -1,21 +1,23 @@
 import base64
-import io
 import json
 import os
 import logging
-from datetime import date, datetime, time
-from pytz import timezone
+from itertools import chain
+from operator import itemgetter
+from pathlib import Path
+from datetime import date, datetime, time, timedelta
+import time as _time
 from time import sleep
+from zoneinfo import ZoneInfo
 
-import pandas as pd
 import requests
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build, Resource
 from googleapiclient.errors import HttpError
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from email.message import EmailMessage
 
 # Configure logging
 logging.basicConfig(
@@ -28,6 +30,25 @@ SCOPES = ["https://www.googleapis.com/auth/gmail.send"]
 
 TOKEN_FILE = "token.json"
 
+# Translation from the standard base64 alphabet to the URL-safe one used by the Gmail API
+URLSAFE_B64 = bytes.maketrans(b"+/", b"-_")
+
+UTC = ZoneInfo("UTC")
+EASTERN = ZoneInfo("US/Eastern")
+
+# Odds responses are cached on disk per date so a restart doesn't re-query The Odds API
+CACHE_DIR = Path("cache")
+CACHE_TTL = 600  # seconds
+
+# Shared session so the connection to The Odds API is kept alive between polls and reused across retries
+_RETRY = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504], allowed_methods=["GET"])
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=4, max_retries=_RETRY))
+_SESSION.headers["Connection"] = "keep-alive"
+
+# Date, ETag and payload of the last odds response, used to make conditional requests to The Odds API for the same date
+_LAST_RESPONSE = None
+
 
 def authenticate_with_google() -> Credentials:
     """Authenticate with credentials.json or token.json if it exists.
@@ -50,6 +71,9 @@ def authenticate_with_google() -> Credentials:
             creds.refresh(Request())
             logging.info("Refreshed expired credentials.")
         else:
+            # Only needed for the first login, so the OAuth flow libraries are imported here
+            from google_auth_oauthlib.flow import InstalledAppFlow
+
             flow = InstalledAppFlow.from_client_secrets_file(
                 "client_secrets.json",
                 scopes=SCOPES,
@@ -65,6 +89,22 @@ def authenticate_with_google() -> Credentials:
     return creds
 
 
+def build_service(creds: Credentials) -> Resource:
+    """Build the Gmail API service from the discovery document bundled with googleapiclient.
+
+    Parameters
+    ----------
+    creds: Credentials
+        Credentials for the Google API.
+
+    Returns
+    -------
+    Resource
+        Resource authenticated with Google's API to send messages.
+    """
+    return build("gmail", "v1", credentials=creds, cache_discovery=False, static_discovery=True)
+
+
 def create_email_message(sender: str, to: str, body: str) -> dict:
     """Create an email message in MIME format.
 
@@ -80,60 +120,70 @@ def create_email_message(sender: str, to: str, body: str) -> dict:
     Returns
     -------
     dict
-        Dictionary containing the message in utf-8
+        Dictionary containing the message as ASCII URL-safe base64 under the "raw" key.
     """
     logging.debug(f"Creating email from {sender} to {to}.")
-    message = MIMEMultipart()
-    message["to"] = to
-    message["from"] = sender
-    msg = MIMEText(body)
-    message.attach(msg)
-    raw_message = base64.urlsafe_b64encode(message.as_bytes()).decode("utf-8")
+    message = EmailMessage()
+    message["To"] = to
+    message["From"] = sender
+    message.set_content(body)
+    raw_message = base64.b64encode(bytes(message)).translate(URLSAFE_B64).decode("ascii")
     return {"raw": raw_message}
 
 
-def send_email(service: Resource, sender: str, to: str, body: str) -> None:
-    """Send an email using Gmail API.
+def send_emails(service: Resource, sender: str, recipients: list[str], body: str) -> None:
+    """Send an email to each recipient using a single Gmail API batch request.
 
     Parameters
     ----------
     service: Resource
         Resource authenticated with Google's API to send messages.
     sender: str
-        The sender of the message.
-    to: str
-        The recipient of the message.
+        The sender of the messages.
+    recipients: list[str]
+        The recipients of the message.
     body: str
         The content of the message.
     """
-    try:
+
+    def callback(request_id: str, response: dict, exception: HttpError | None) -> None:
+        to = recipients[int(request_id)]
+        if exception is not None:
+            logging.error(f"Failed to send email to {to}: {exception}")
+        else:
+            logging.info(f"Email sent to {to}.")
+
+    batch = service.new_batch_http_request(callback=callback)
+    for i, to in enumerate(recipients):
         message = create_email_message(sender, to, body)
-        service.users().messages().send(userId="me", body=message).execute()
-        logging.info(f"Email sent to {to}.")
+        batch.add(service.users().messages().send(userId="me", body=message), request_id=str(i))
+
+    try:
+        batch.execute()
     except HttpError as error:
-        logging.error(f"Failed to send email: {error}")
+        logging.error(f"Failed to send emails: {error}")
 
 
-def get_spreads(current_date: date, key=str) -> pd.DataFrame:
-    """Get the spreads for all MLB games for a particular date.
+def fetch_odds(current_date: date, key: str) -> list[dict]:
+    """Request the FanDuel moneyline odds for all MLB games on a particular date from The Odds API.
 
     Parameters
     ----------
     current_date: date
-        The date to get the MLB spreads for.
+        The date to get the MLB odds for.
     key: str
         Key to use for the request to The Odds API.
 
     Returns
     -------
-    pd.DataFrame
-        DataFrame containing the name of each MLB team who plays on `current_date` along with their moneyline odds and
-        spread.
+    list[dict]
+        The games returned by The Odds API.
     """
+    global _LAST_RESPONSE
+
     logging.info(f"Fetching spreads for {current_date.isoformat()}...")
-    date_format = "%Y-%m-%dT%H:%M:%SZ"
-    start = datetime.combine(current_date, time(10, 0, 0)).astimezone(timezone("UTC")).strftime(date_format)
-    end = datetime.combine(current_date, time(23, 59, 59)).astimezone(timezone("UTC")).strftime(date_format)
+    start = datetime.combine(current_date, time(10, 0, 0)).astimezone(UTC)
+    end = datetime.combine(current_date, time(23, 59, 59)).astimezone(UTC)
 
     params = {
         "api_key": key,
@@ -141,56 +191,118 @@ def get_spreads(current_date: date, key=str) -> pd.DataFrame:
         "markets": "h2h",
         "oddsFormat": "american",
         "bookmakers": "fanduel",
-        "commenceTimeFrom": start,
-        "commenceTimeTo": end,
+        "commenceTimeFrom": f"{start:%Y-%m-%dT%H:%M:%SZ}",
+        "commenceTimeTo": f"{end:%Y-%m-%dT%H:%M:%SZ}",
     }
     url = "https://api.the-odds-api.com/v4/sports/baseball_mlb/odds/"
-    res = requests.get(url, params=params)
-    odds = json.load(io.BytesIO(res.content))
+    # Only revalidate a payload that was fetched for the same date, since the query changes every day
+    headers = {}
+    if _LAST_RESPONSE is not None and _LAST_RESPONSE[0] == current_date and _LAST_RESPONSE[1]:
+        headers["If-None-Match"] = _LAST_RESPONSE[1]
+
+    res = _SESSION.get(url, params=params, headers=headers, timeout=(5, 15))
+    res.raise_for_status()
+    if res.status_code == 304:
+        logging.info("Odds unchanged since last request, reusing cached data.")
+        odds = _LAST_RESPONSE[2]
+    else:
+        odds = json.loads(res.content)
+        _LAST_RESPONSE = (current_date, res.headers.get("ETag"), odds)
 
     logging.debug(f"Received odds data: {json.dumps(odds, indent=2)[:500]}...")  # Truncated for brevity
+    return odds
+
+
+def get_spreads(current_date: date, key=str) -> list[dict]:
+    """Get the spreads for all MLB games for a particular date.
+
+    Parameters
+    ----------
+    current_date: date
+        The date to get the MLB spreads for.
+    key: str
+        Key to use for the request to The Odds API.
 
-    spreads = pd.DataFrame.from_records(
-        [team for game in odds for team in game["bookmakers"][0]["markets"][0]["outcomes"]]
-    )
+    Returns
+    -------
+    list[dict]
+        Outcomes containing the name of each MLB team who plays on `current_date` along with their moneyline odds and
+        spread.
+    """
+    cache_file = CACHE_DIR / f"{current_date.isoformat()}.json"
+    if cache_file.exists() and _time.time() - cache_file.stat().st_mtime < CACHE_TTL:
+        logging.info(f"Loading spreads for {current_date.isoformat()} from {cache_file}...")
+        odds = json.loads(cache_file.read_bytes())
+    else:
+        odds = fetch_odds(current_date, key)
+        CACHE_DIR.mkdir(exist_ok=True)
+
+        # Write to a temporary file first so a crash mid-write never leaves a truncated cache file
+        tmp_file = cache_file.with_suffix(".tmp")
+        tmp_file.write_text(json.dumps(odds))
+        os.replace(tmp_file, cache_file)
+
+        # Only today's response is ever read, so remove the files for other dates
+        for old_file in CACHE_DIR.iterdir():
+            if old_file != cache_file:
+                old_file.unlink(missing_ok=True)
+
+    spreads = list(chain.from_iterable(game["bookmakers"][0]["markets"][0]["outcomes"] for game in odds))
     logging.info(f"Fetched {len(spreads)} spread records.")
     return spreads
 
 
+def seconds_until_next_day() -> float:
+    """Get the number of seconds until just after the next midnight in Eastern time.
+
+    Returns
+    -------
+    float
+        Seconds to sleep before the next day's routine should run.
+    """
+    now = datetime.now(EASTERN)
+    tomorrow = datetime.combine(now.date() + timedelta(days=1), time(0, 0, 1), tzinfo=EASTERN)
+    # Compare timestamps since subtracting datetimes with the same tzinfo ignores DST changes
+    return tomorrow.timestamp() - now.timestamp()
+
+
 def main() -> None:
     """Send the best MLB odds as an email every day."""
     sender_email = os.environ["SENDER_EMAIL"]
-    recipient_email = os.environ["RECIPIENT_EMAIL"]
+    recipient_emails = [email.strip() for email in os.environ["RECIPIENT_EMAIL"].split(",") if email.strip()]
     key = os.environ["ODDS_API_KEY"]
 
-    new_day = True
+    service = None
     while True:
         try:
-            if new_day:
-                # Get best bet for the current date
-                current_date = datetime.now(timezone("US/Eastern")).date()
-                logging.info(f"Starting routine for {current_date}...")
-
-                spreads = get_spreads(current_date, key)
-
-                if spreads.empty:
-                    logging.warning("No spread data found for today.")
-                else:
-                    try:
-                        best_bet = spreads.loc[spreads.price.idxmin()]
-                        logging.info(f"Best bet selected: {best_bet.to_dict()}")
-                    except Exception as e:
-                        logging.error(f"Error selecting best bet: {e}")
-                        best_bet = None
-
-                    if best_bet is not None:
-                        # Authenticate with google and send best bet message
-                        creds = authenticate_with_google()
-                        service = build("gmail", "v1", credentials=creds)
-                        send_email(service, sender_email, recipient_email, body=str(best_bet))
-
-            new_day = current_date < datetime.now(timezone("US/Eastern")).date()
-            sleep(60)
+            if service is None:
+                # Authenticate with google once and reuse the service for every send
+                service = build_service(authenticate_with_google())
+
+            # Get best bet for the current date
+            current_date = datetime.now(EASTERN).date()
+            logging.info(f"Starting routine for {current_date}...")
+
+            spreads = get_spreads(current_date, key)
+
+            if not spreads:
+                logging.warning("No spread data found for today.")
+            else:
+                try:
+                    best_bet = min(spreads, key=itemgetter("price"))
+                    logging.info(f"Best bet selected: {best_bet}")
+                except Exception as e:
+                    logging.error(f"Error selecting best bet: {e}")
+                    best_bet = None
+
+                if best_bet is not None:
+                    # Send best bet message, the service refreshes expired credentials on demand
+                    send_emails(service, sender_email, recipient_emails, body=json.dumps(best_bet, indent=2))
+
+            # Sleep until the next day instead of polling for a date change
+            delay = seconds_until_next_day()
+            logging.info(f"Sleeping {delay:.0f} seconds until the next day.")
+            sleep(delay)
 
         except Exception as e:
             logging.exception(f"Unexpected error in main loop: {e}")